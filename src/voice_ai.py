@@ -5,21 +5,38 @@ Supports both demo mode (local testing) and production mode (with Plivo)
 """
 
 import asyncio
+import atexit
 import json
 import base64
+import importlib.util
+import io
+import itertools
 import logging
+import logging.handlers
 import os
+import queue
+import re
+import struct
 import sys
 import tempfile
 import threading
 import time
+import uuid
+import wave
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from typing import (
+    AsyncIterator, Dict, Generator, Iterator, List, NamedTuple, Optional, Union
+)
 from pathlib import Path
 
 import uvicorn
-from fastapi import FastAPI, WebSocket, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, WebSocket, HTTPException, Request, Response
+from fastapi.responses import (
+    HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
+)
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -28,14 +45,15 @@ import numpy as np
 
 # Try to import optional dependencies
 try:
-    import whisper
+    from faster_whisper import WhisperModel
     WHISPER_AVAILABLE = True
 except ImportError:
     WHISPER_AVAILABLE = False
     print("⚠️  Whisper not available - using mock STT")
 
 try:
-    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
+    from transformers.pytorch_utils import Conv1D
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
@@ -55,29 +73,82 @@ except ImportError:
     PLIVO_AVAILABLE = False
     print("⚠️  Plivo not available - demo mode only")
 
+# ORJSONResponse imports orjson itself; only check that it is installed
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+
 # Load environment variables
 load_dotenv()
 
+# Name of the root logger's queue handler, so a second import of this module
+# (as __main__, then as voice_ai under uvicorn) reuses it instead of adding another
+LOG_HANDLER_NAME = "voice_ai_queue"
+
 # Setup logging
-def setup_logging():
+def setup_logging() -> logging.handlers.QueueListener:
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if handler.get_name() == LOG_HANDLER_NAME:
+            return handler.listener
+    
     log_level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO'))
     log_file = os.getenv('LOG_FILE', 'logs/voice_ai.log')
     
     # Create logs directory
     Path(log_file).parent.mkdir(exist_ok=True)
     
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler(sys.stdout)
-        ]
+    formatter = logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    # Request handlers only enqueue records; a background thread does the writes
+    # The queue handler must pass the bare message on, or the listener's
+    # handlers would format an already formatted line
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    queue_handler.set_name(LOG_HANDLER_NAME)
+    
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
     )
+    queue_handler.listener = listener
+    listener.start()
+    root.addHandler(queue_handler)
+    root.setLevel(log_level)
+    atexit.register(listener.stop)
+    return listener
 
-setup_logging()
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
+# Cookie that pins a demo client to its conversation, so clients don't have
+# to send conversation_id with every message
+CONVERSATION_COOKIE = "conv"
+
+# Text is synthesized and streamed one sentence at a time
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+# Flush speech for a run-on sentence once it reaches this many words
+MAX_TTS_CHUNK_WORDS = 20
+
+# Longest audio chunk converted in the preallocated transcription buffer
+WHISPER_SAMPLE_RATE = 16000
+MAX_AUDIO_SECONDS = 30
+
+# Prompt length limit in tokens, of which TURN_TOKENS are kept free for the
+# new customer turn
+PROMPT_TOKENS = 400
+TURN_TOKENS = 80
+
+SYSTEM_PROMPT = """You are a helpful customer service representative.
+Be polite, professional, and concise. Keep responses under 40 words.
+If you don't know something, offer to connect them with a specialist."""
+
+PROMPT_HEADER = f"{SYSTEM_PROMPT}\n\nConversation:\n"
+
 # Request Models
 class CallRequest(BaseModel):
     phone_number: str
@@ -87,39 +158,252 @@ class DemoRequest(BaseModel):
     user_input: str
     conversation_id: Optional[str] = None
 
+class DemoBatchRequest(BaseModel):
+    user_inputs: List[str]
+    conversation_id: Optional[str] = None
+
+class DemoPrefetchRequest(BaseModel):
+    conversation_id: Optional[str] = None
+
+class TTSRequest(BaseModel):
+    text: str
+
+def quantize_llm(model):
+    """Dynamically quantize the model's linear layers to int8 for faster CPU use"""
+    # GPT-2 style models (DialoGPT) use Conv1D for their projections, which
+    # quantize_dynamic skips, so swap them for the equivalent nn.Linear first
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, Conv1D):
+                linear = torch.nn.Linear(child.weight.shape[0], child.nf)
+                linear.weight = torch.nn.Parameter(child.weight.t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+def _common_prefix_length(a: List[int], b: List[int]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+def _cache_length(past) -> int:
+    """Number of tokens held in a past_key_values cache"""
+    if hasattr(past, 'get_seq_length'):
+        return past.get_seq_length()
+    return past[0][0].shape[2]
+
+def _crop_cache(past, length: int):
+    """Drop cached keys/values past the first `length` tokens"""
+    if hasattr(past, 'crop'):
+        drop = _cache_length(past) - length
+        if drop > 0:
+            past.crop(-drop)
+        return past
+    return tuple(tuple(t[:, :, :length] for t in layer) for layer in past)
+
+def _reusable_cache(prompt_ids: List[int], kv_cache: tuple):
+    """Crop a cache to the part prompt_ids shares with it; returns (past, length)"""
+    if kv_cache is None:
+        return None, 0
+    past, cached_ids = kv_cache
+    # Keep at least one prompt token to run through the model
+    reuse = _common_prefix_length(cached_ids, prompt_ids[:-1])
+    return (_crop_cache(past, reuse), reuse) if reuse else (None, 0)
+
+def wav_stream_header(channels: int, sample_width: int, sample_rate: int) -> bytes:
+    """WAV header with unknown length, for audio sent as it is generated"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 0xFFFFFFFF, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate,
+        channels * sample_width, sample_width * 8,
+        b'data', 0xFFFFFFFF
+    )
+
+class BatchedLLM:
+    """Coalesces prompts that arrive within a short window into one generate() call"""
+    
+    def __init__(
+        self, model, pad_token_id: int, generation_kwargs,
+        window_ms: float = 5, max_batch_size: int = 8
+    ):
+        self.model = model
+        self.pad_token_id = pad_token_id
+        self.generation_kwargs = generation_kwargs
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, prompt_ids: List[int], kv_cache: tuple = None) -> tuple:
+        """Generate a continuation of prompt_ids, blocking until its batch is done.
+        
+        kv_cache is the (past_key_values, token_ids) pair returned for an earlier
+        turn of the same conversation. Returns (new token ids, kv_cache or None).
+        """
+        future = Future()
+        self._queue.put((prompt_ids, kv_cache, future, False))
+        return future.result()
+    
+    def prefill(self, prompt_ids: List[int], kv_cache: tuple = None) -> tuple:
+        """Run prompt_ids through the model without generating; returns a kv_cache"""
+        future = Future()
+        self._queue.put((prompt_ids, kv_cache, future, True))
+        return future.result()
+    
+    def close(self):
+        """Stop the worker thread once the prompts already queued are done"""
+        self._queue.put(None)
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            batch = [item]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    if timeout > 0:
+                        item = self._queue.get(timeout=timeout)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                batch.append(item)
+            
+            # Prefills and prompts that can reuse a conversation's cache run on
+            # their own; the rest share one padded batch
+            fresh = [item for item in batch if item[1] is None and not item[3]]
+            if len(fresh) > 1:
+                self._complete(fresh, self._generate_batch)
+                batch = [item for item in batch if item[1] is not None or item[3]]
+            for item in batch:
+                generate = self._prefill_one if item[3] else self._generate_one
+                self._complete([item], generate)
+    
+    def _complete(self, items: list, generate):
+        try:
+            results = generate([item[:2] for item in items])
+        except Exception as e:
+            for _, _, future, _ in items:
+                future.set_exception(e)
+        else:
+            for (_, _, future, _), result in zip(items, results):
+                future.set_result(result)
+    
+    def _prefill_one(self, requests: list) -> list:
+        """Fill a cache for a prompt, feeding only the tokens its cache doesn't cover"""
+        (prompt_ids, kv_cache), = requests
+        past, reuse = _reusable_cache(prompt_ids, kv_cache)
+        
+        input_ids = torch.tensor([prompt_ids[reuse:]], device=self.model.device)
+        with torch.inference_mode():
+            outputs = self.model(input_ids, past_key_values=past, use_cache=True)
+        return [(outputs.past_key_values, prompt_ids)]
+    
+    def _generate_one(self, requests: list) -> list:
+        """Generate for one prompt, feeding only the tokens its cache doesn't cover"""
+        (prompt_ids, kv_cache), = requests
+        past, _ = _reusable_cache(prompt_ids, kv_cache)
+        
+        input_ids = torch.tensor([prompt_ids], device=self.model.device)
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past,
+                return_dict_in_generate=True,
+                **self.generation_kwargs(input_ids)
+            )
+        
+        sequence = outputs.sequences[0].tolist()
+        past = outputs.past_key_values
+        return [(sequence[len(prompt_ids):], (past, sequence[:_cache_length(past)]))]
+    
+    def _generate_batch(self, requests: list) -> list:
+        """Run one left-padded generate() over the batch; returns the new tokens"""
+        prompts = [prompt_ids for prompt_ids, _ in requests]
+        width = max(len(prompt) for prompt in prompts)
+        device = self.model.device
+        input_ids = torch.tensor(
+            [[self.pad_token_id] * (width - len(p)) + p for p in prompts], device=device
+        )
+        attention_mask = torch.tensor(
+            [[0] * (width - len(p)) + [1] * len(p) for p in prompts], device=device
+        )
+        
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                **self.generation_kwargs(input_ids)
+            )
+        
+        return [(row[width:].tolist(), None) for row in outputs]
+
+class Message(NamedTuple):
+    """One message of a demo conversation"""
+    timestamp: int  # time.time_ns()
+    speaker: str
+    message: str
+    type: str = "text"
+    
+    def to_dict(self) -> dict:
+        """JSON form of the message, with an ISO timestamp"""
+        message = self._asdict()
+        message["timestamp"] = datetime.fromtimestamp(self.timestamp / 1e9).isoformat()
+        return message
+
 class MockAudioProcessor:
     """Mock audio processor for demo mode"""
     
+    RESPONSES = (
+        "I understand you'd like assistance. How can I help you today?",
+        "Thank you for that information. Let me help you with that.",
+        "I see. Could you provide more details about your request?",
+        "That's a great question. Let me explain that for you.",
+        "I'll be happy to assist you with that. What else would you like to know?",
+        "Is there anything specific you'd like help with?",
+        "Thank you for calling. How else can I assist you today?"
+    )
+    
+    MOCK_INPUTS = (
+        "Hello, I need help with my account",
+        "Can you help me with billing questions?",
+        "I want to know about your services",
+        "How do I cancel my subscription?",
+        "What are your business hours?",
+        "Can I speak to a manager?",
+        "Thank you for your help"
+    )
+    
     def __init__(self):
-        self.responses = [
-            "I understand you'd like assistance. How can I help you today?",
-            "Thank you for that information. Let me help you with that.",
-            "I see. Could you provide more details about your request?",
-            "That's a great question. Let me explain that for you.",
-            "I'll be happy to assist you with that. What else would you like to know?",
-            "Is there anything specific you'd like help with?",
-            "Thank you for calling. How else can I assist you today?"
-        ]
-        self.response_index = 0
+        # next() on a cycle is a single C call, so concurrent turns can't
+        # interleave a read and an increment the way a shared index could
+        self._responses = itertools.cycle(self.RESPONSES)
+        self._inputs = itertools.cycle(self.MOCK_INPUTS)
     
     def transcribe(self, audio_data: bytes) -> str:
         """Mock speech-to-text"""
-        mock_inputs = [
-            "Hello, I need help with my account",
-            "Can you help me with billing questions?",
-            "I want to know about your services",
-            "How do I cancel my subscription?",
-            "What are your business hours?",
-            "Can I speak to a manager?",
-            "Thank you for your help"
-        ]
-        return mock_inputs[self.response_index % len(mock_inputs)]
+        return next(self._inputs)
     
     def generate_response(self, user_input: str) -> str:
         """Mock LLM response generation"""
-        response = self.responses[self.response_index % len(self.responses)]
-        self.response_index += 1
-        return response
+        return next(self._responses)
     
     def text_to_speech(self, text: str) -> bytes:
         """Mock TTS - returns empty bytes"""
@@ -130,7 +414,20 @@ class VoiceAI:
     
     def __init__(self):
         self.demo_mode = os.getenv('DEMO_MODE', 'true').lower() == 'true'
-        logger.info(f"🤖 Initializing Voice AI (Demo Mode: {self.demo_mode})")
+        logger.info("🤖 Initializing Voice AI (Demo Mode: %s)", self.demo_mode)
+        
+        # Run models on the GPU in half precision when one is available
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.dtype = torch.float16 if self.device == 'cuda' else torch.float32
+        
+        # pyttsx3 engines are tied to the thread that created them, so TTS runs on
+        # its own workers, each lazily building an engine of its own
+        self._tts_local = threading.local()
+        self._tts_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('TTS_WORKERS', 1)),
+            thread_name_prefix='tts'
+        )
+        self.tts_enabled = False
         
         # Initialize components based on mode
         if self.demo_mode:
@@ -139,8 +436,21 @@ class VoiceAI:
             self._init_production_mode()
         
         # Call management
-        self.active_calls: Dict[str, dict] = {}
-        self.demo_conversations: Dict[str, List[dict]] = {}
+        # Both are LRU-ordered and capped at MAX_CONVERSATIONS entries
+        self.active_calls: Dict[str, dict] = OrderedDict()
+        self.demo_conversations: Dict[str, List[Message]] = OrderedDict()
+        self._max_conversations = int(os.getenv('MAX_CONVERSATIONS', 1024))
+        self._conversations_lock = threading.Lock()
+        
+        # Per-conversation LLM keys/values, most recently used last
+        self._kv_caches: OrderedDict = OrderedDict()
+        self._kv_cache_limit = int(os.getenv('KV_CACHE_CONVERSATIONS', 8))
+        
+        # Scratch space for converting call audio before transcription
+        self._audio_buf = np.empty(
+            WHISPER_SAMPLE_RATE * MAX_AUDIO_SECONDS, dtype=np.float32
+        )
+        self._audio_lock = threading.Lock()
         
         logger.info("✅ Voice AI initialized successfully!")
     
@@ -153,10 +463,10 @@ class VoiceAI:
         if WHISPER_AVAILABLE and os.getenv('USE_LOCAL_MODELS', 'true').lower() == 'true':
             try:
                 logger.info("📥 Loading Whisper model for demo...")
-                self.whisper_model = whisper.load_model("base")
+                self._load_whisper("base")
                 logger.info("✅ Whisper loaded")
             except Exception as e:
-                logger.warning(f"⚠️  Could not load Whisper: {e}")
+                logger.warning("⚠️  Could not load Whisper: %s", e)
                 self.whisper_model = None
         else:
             self.whisper_model = None
@@ -164,14 +474,10 @@ class VoiceAI:
         if TRANSFORMERS_AVAILABLE:
             try:
                 logger.info("📥 Loading LLM for demo...")
-                model_name = "microsoft/DialoGPT-medium"
-                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.llm_model = AutoModelForCausalLM.from_pretrained(model_name)
-                if self.tokenizer.pad_token is None:
-                    self.tokenizer.pad_token = self.tokenizer.eos_token
+                self._load_llm("microsoft/DialoGPT-medium")
                 logger.info("✅ LLM loaded")
             except Exception as e:
-                logger.warning(f"⚠️  Could not load LLM: {e}")
+                logger.warning("⚠️  Could not load LLM: %s", e)
                 self.tokenizer = None
                 self.llm_model = None
         else:
@@ -180,14 +486,10 @@ class VoiceAI:
         
         if TTS_AVAILABLE:
             try:
-                self.tts_engine = pyttsx3.init()
-                self.tts_engine.setProperty('rate', 150)
+                self._init_tts()
                 logger.info("✅ TTS initialized")
             except Exception as e:
-                logger.warning(f"⚠️  Could not initialize TTS: {e}")
-                self.tts_engine = None
-        else:
-            self.tts_engine = None
+                logger.warning("⚠️  Could not initialize TTS: %s", e)
         
         self.plivo_client = None
     
@@ -207,25 +509,108 @@ class VoiceAI:
         
         self.plivo_client = RestClient(auth_id, auth_token)
         
+        # Answer XML only depends on PUBLIC_URL, so build it once
+        public_url = os.getenv('PUBLIC_URL', 'http://localhost:8000')
+        ws_url = f"{public_url.replace('http', 'ws')}/ws/call"
+        
+        answer_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Stream bidirectional="true" keepCallAlive="true" 
+            streamTimeout="86400" contentType="audio/x-l16" 
+            sampleRate="8000">{ws_url}</Stream>
+</Response>"""
+        self._answer_url = 'data:application/xml;charset=utf-8,' + answer_xml
+        
         # Load AI models
         self._load_models()
     
     def _load_models(self):
         """Load AI models for production"""
         if WHISPER_AVAILABLE:
-            model_name = os.getenv('WHISPER_MODEL', 'base')
-            self.whisper_model = whisper.load_model(model_name)
+            self._load_whisper(os.getenv('WHISPER_MODEL', 'base'))
         
         if TRANSFORMERS_AVAILABLE:
-            model_name = os.getenv('LLM_MODEL', 'microsoft/DialoGPT-medium')
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.llm_model = AutoModelForCausalLM.from_pretrained(model_name)
-            if self.tokenizer.pad_token is None:
-                self.tokenizer.pad_token = self.tokenizer.eos_token
+            self._load_llm(os.getenv('LLM_MODEL', 'microsoft/DialoGPT-medium'))
         
         if TTS_AVAILABLE:
-            self.tts_engine = pyttsx3.init()
-            self.tts_engine.setProperty('rate', 150)
+            self._init_tts()
+    
+    def _init_tts(self):
+        """Build an engine on a TTS worker now so setup errors surface at startup"""
+        self._tts_executor.submit(self._engine).result()
+        self.tts_enabled = True
+    
+    def _new_tts_engine(self):
+        """Create a pyttsx3 engine for the calling thread"""
+        # pyttsx3.init() hands every thread the same cached engine
+        engine = pyttsx3.Engine()
+        engine.setProperty('rate', 150)
+        return engine
+    
+    def _engine(self):
+        """Return this thread's TTS engine, creating it on first use"""
+        engine = getattr(self._tts_local, 'engine', None)
+        if engine is None:
+            engine = self._tts_local.engine = self._new_tts_engine()
+        return engine
+    
+    def _load_whisper(self, model_name: str):
+        """Load the CTranslate2 Whisper model, int8 unless WHISPER_CT says otherwise"""
+        default_compute_type = 'int8_float16' if self.device == 'cuda' else 'int8'
+        self.whisper_model = WhisperModel(
+            model_name,
+            device=self.device,
+            compute_type=os.getenv('WHISPER_CT', default_compute_type)
+        )
+    
+    def _load_llm(self, model_name: str):
+        """Load the tokenizer and LLM: fp16 on GPU, int8 on CPU unless disabled"""
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.llm_model = AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=self.dtype
+        ).to(self.device)
+        self.llm_model.eval()
+        # Dynamic quantization only has CPU kernels
+        if self.device == 'cpu' and os.getenv('LLM_QUANTIZE', 'int8').lower() == 'int8':
+            self.llm_model = quantize_llm(self.llm_model)
+            logger.info("⚡ LLM quantized to int8")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self._cache_prompt_ids()
+        if os.getenv('TORCH_COMPILE', '0') == '1':
+            self._compile_llm()
+        
+        self.batched_llm = BatchedLLM(
+            self.llm_model,
+            self.tokenizer.pad_token_id,
+            self._generation_kwargs,
+            window_ms=float(os.getenv('MICRO_BATCH_WINDOW_MS', 5)),
+            max_batch_size=int(os.getenv('MICRO_BATCH_SIZE', 8))
+        )
+    
+    def _cache_prompt_ids(self):
+        """Tokenize the fixed parts of every prompt once"""
+        self._sys_ids = self.tokenizer.encode(PROMPT_HEADER)
+        self._asst_marker_ids = self.tokenizer.encode("Assistant:")
+    
+    def _compile_llm(self):
+        """Compile the LLM forward pass and warm it up before the first request"""
+        # generate() calls the model's own forward, so compile that rather
+        # than wrapping the module
+        eager_forward = self.llm_model.forward
+        self.llm_model.forward = torch.compile(
+            eager_forward, mode='reduce-overhead', dynamic=True
+        )
+        try:
+            inputs = self.tokenizer.encode('hi', return_tensors='pt').to(self.device)
+            with torch.inference_mode():
+                self.llm_model.generate(
+                    inputs, max_length=8, pad_token_id=self.tokenizer.pad_token_id
+                )
+            logger.info("⚡ LLM compiled")
+        except Exception as e:
+            logger.warning("⚠️  Could not compile LLM, running eagerly: %s", e)
+            self.llm_model.forward = eager_forward
     
     def transcribe_audio(self, audio_data: bytes) -> str:
         """Convert audio to text"""
@@ -234,15 +619,34 @@ class VoiceAI:
         
         if self.whisper_model:
             try:
-                # Convert bytes to numpy array for Whisper
-                audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-                result = self.whisper_model.transcribe(audio_np, language='en')
-                return result["text"].strip()
+                # Reuse the shared buffer unless another transcription holds it
+                use_buffer = self._audio_lock.acquire(blocking=False)
+                try:
+                    audio_np = self._pcm_to_float(audio_data, use_buffer)
+                    segments, _ = self.whisper_model.transcribe(
+                        audio_np, language='en', beam_size=1, vad_filter=True
+                    )
+                    # Segments are decoded lazily; consume them while audio_np is ours
+                    return " ".join(segment.text for segment in segments).strip()
+                finally:
+                    if use_buffer:
+                        self._audio_lock.release()
             except Exception as e:
-                logger.error(f"❌ Transcription error: {e}")
+                logger.error("❌ Transcription error: %s", e)
         
         return "Sorry, I didn't catch that."
     
+    def _pcm_to_float(self, audio_data: bytes, use_buffer: bool) -> np.ndarray:
+        """Convert 16-bit PCM bytes to float32 samples in [-1, 1)"""
+        samples = np.frombuffer(audio_data, dtype=np.int16, count=len(audio_data) // 2)
+        if use_buffer and len(samples) <= len(self._audio_buf):
+            out = self._audio_buf[:len(samples)]
+        else:
+            out = np.empty(len(samples), dtype=np.float32)
+        
+        np.multiply(samples, np.float32(1.0 / 32768.0), out=out, casting='unsafe')
+        return out
+    
     def generate_response(self, user_input: str, conversation_id: str = None) -> str:
         """Generate AI response"""
         if self.demo_mode:
@@ -254,174 +658,517 @@ class VoiceAI:
         
         return self._generate_llm_response(user_input, conversation_id)
     
-    def _generate_llm_response(self, user_input: str, conversation_id: str = None) -> str:
+    def _generate_llm_response(
+        self, user_input: str, conversation_id: str = None
+    ) -> str:
         """Generate response using LLM"""
         try:
-            # Get conversation history
-            if conversation_id not in self.active_calls:
-                self.active_calls[conversation_id] = {'history': []}
+            call_data, inputs = self._prepare_llm_inputs(user_input, conversation_id)
             
-            call_data = self.active_calls[conversation_id]
+            output_ids, kv_cache = self.batched_llm.submit(
+                inputs[0].tolist(), self._kv_caches.pop(conversation_id, None)
+            )
+            if kv_cache is not None:
+                self._store_kv_cache(conversation_id, kv_cache)
+            response = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+            return self._record_llm_response(call_data, response)
             
-            # System prompt
-            system_prompt = """You are a helpful customer service representative.
-            Be polite, professional, and concise. Keep responses under 40 words.
-            If you don't know something, offer to connect them with a specialist."""
+        except Exception as e:
+            logger.error("❌ Response generation error: %s", e)
+            return "I apologize for the technical difficulty. How can I assist you?"
+    
+    def _stream_llm_response(
+        self, user_input: str, conversation_id: str = None
+    ) -> Generator[str, None, str]:
+        """Generate response using LLM, yielding text as tokens are produced.
+        
+        Returns the cleaned-up reply that was added to the history.
+        """
+        try:
+            call_data, inputs = self._prepare_llm_inputs(user_input, conversation_id)
             
-            # Add to history
-            call_data['history'].append(f"Customer: {user_input}")
+            past, _ = _reusable_cache(
+                inputs[0].tolist(), self._kv_caches.pop(conversation_id, None)
+            )
             
-            # Create prompt with context
-            recent_history = call_data['history'][-6:]  # Last 3 exchanges
-            context = "\n".join(recent_history)
-            prompt = f"{system_prompt}\n\nConversation:\n{context}\nAssistant:"
+            streamer = TextIteratorStreamer(
+                self.tokenizer, skip_prompt=True, skip_special_tokens=True
+            )
+            outcome = {}
+            generation = threading.Thread(
+                target=self._generate_with_streamer,
+                args=(inputs, past, streamer, outcome),
+                daemon=True
+            )
+            generation.start()
             
-            # Generate response
-            inputs = self.tokenizer.encode(prompt, return_tensors='pt', max_length=400, truncation=True)
+            pieces = []
+            for piece in streamer:
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+            generation.join()
+            if 'error' in outcome:
+                raise outcome['error']
+            self._store_kv_cache(conversation_id, outcome['kv_cache'])
             
-            with torch.no_grad():
+            response = self._record_llm_response(call_data, "".join(pieces))
+            if not pieces:
+                yield response
+            return response
+                
+        except Exception as e:
+            logger.error("❌ Response generation error: %s", e)
+            response = "I apologize for the technical difficulty. How can I assist you?"
+            yield response
+            return response
+    
+    def _generate_with_streamer(self, inputs, past, streamer, outcome: dict):
+        """Run generation on a background thread, feeding tokens to streamer.
+        
+        Sets outcome['kv_cache'] for the conversation, or outcome['error'].
+        """
+        input_ids = inputs.to(self.device)
+        try:
+            with torch.inference_mode():
                 outputs = self.llm_model.generate(
-                    inputs,
-                    max_length=inputs.shape[1] + 50,
-                    temperature=0.8,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.pad_token_id
+                    input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    past_key_values=past,
+                    return_dict_in_generate=True,
+                    streamer=streamer,
+                    **self._generation_kwargs(inputs)
                 )
-            
-            response = self.tokenizer.decode(outputs[0][inputs.shape[1]:], skip_special_tokens=True)
-            response = response.strip().replace("Assistant:", "")
-            
-            if not response or len(response) < 3:
-                response = "I understand. How else can I help you?"
-            
-            # Add to history
-            call_data['history'].append(f"Assistant: {response}")
-            
-            return response
-            
         except Exception as e:
-            logger.error(f"❌ Response generation error: {e}")
-            return "I apologize for the technical difficulty. How can I assist you?"
+            # generate() only ends the stream when it finishes, so end it here
+            # and hand the error to the consumer
+            outcome['error'] = e
+            streamer.end()
+            return
+        
+        sequence = outputs.sequences[0].tolist()
+        past = outputs.past_key_values
+        outcome['kv_cache'] = (past, sequence[:_cache_length(past)])
+    
+    def _prepare_llm_inputs(self, user_input: str, conversation_id: str = None):
+        """Add the user turn to the history and build the prompt's token ids"""
+        # Get conversation history
+        call_data = self._lru_entry(
+            self.active_calls,
+            conversation_id,
+            lambda: {'history': [], 'history_ids': []}
+        )
+        prefix_ids = self._prompt_prefix_ids(call_data)
+        
+        # Add to history
+        turn_ids = self._add_to_history(call_data, f"Customer: {user_input}")
+        
+        # An overlong message keeps its end so the prompt still ends with the marker
+        room = PROMPT_TOKENS - len(prefix_ids) - len(self._asst_marker_ids)
+        inputs = torch.tensor([prefix_ids + turn_ids[-room:] + self._asst_marker_ids])
+        return call_data, inputs
+    
+    def _add_to_history(self, call_data: dict, line: str) -> List[int]:
+        """Append a line to the conversation history along with its token ids"""
+        line_ids = self.tokenizer.encode(f"{line}\n")
+        call_data['history'].append(line)
+        call_data['history_ids'].append(line_ids)
+        return line_ids
+    
+    def _prompt_prefix_ids(self, call_data: dict) -> List[int]:
+        """Build the prompt's token ids up to the next customer turn"""
+        cached = call_data.get('prefix')
+        if cached and cached[0] == len(call_data['history']):
+            return cached[1]
+        
+        budget = PROMPT_TOKENS - TURN_TOKENS - len(self._sys_ids)
+        
+        # The context only grows so earlier turns' cached keys/values stay valid;
+        # once it no longer fits, restart from the newest lines filling half of it
+        history_ids = call_data['history_ids']
+        start = call_data.get('context_start', 0)
+        if sum(len(ids) for ids in history_ids[start:]) > budget:
+            start, kept = len(history_ids), 0
+            while start > 0 and kept + len(history_ids[start - 1]) <= budget // 2:
+                start -= 1
+                kept += len(history_ids[start])
+            call_data['context_start'] = start
+        
+        prefix_ids = self._sys_ids + [
+            token for ids in history_ids[start:] for token in ids
+        ]
+        call_data['prefix'] = (len(history_ids), prefix_ids)
+        return prefix_ids
+    
+    def _store_kv_cache(self, conversation_id: str, kv_cache: tuple):
+        """Keep a conversation's cache, dropping the least recently used ones"""
+        self._kv_caches[conversation_id] = kv_cache
+        while len(self._kv_caches) > self._kv_cache_limit:
+            self._kv_caches.popitem(last=False)
+    
+    def prefetch_conversation(self, conversation_id: str) -> bool:
+        """Run the next turn's prompt prefix through the LLM while the user types"""
+        call_data = self.active_calls.get(conversation_id)
+        if not (self.llm_model and self.tokenizer) or call_data is None:
+            return False
+        
+        prefix_ids = self._prompt_prefix_ids(call_data)
+        kv_cache = self.batched_llm.prefill(
+            prefix_ids, self._kv_caches.pop(conversation_id, None)
+        )
+        self._store_kv_cache(conversation_id, kv_cache)
+        return True
+    
+    def _generation_kwargs(self, inputs) -> dict:
+        """Sampling settings shared by the blocking and streaming paths"""
+        return {
+            "max_length": inputs.shape[1] + 50,
+            "temperature": 0.8,
+            "do_sample": True,
+            "pad_token_id": self.tokenizer.pad_token_id
+        }
+    
+    def _record_llm_response(self, call_data: dict, response: str) -> str:
+        """Clean up a generated response and add it to the history"""
+        response = response.strip().replace("Assistant:", "")
+        
+        if not response or len(response) < 3:
+            response = "I understand. How else can I help you?"
+        
+        # Add to history
+        self._add_to_history(call_data, f"Assistant: {response}")
+        
+        return response
+    
+    def stream_response(
+        self, user_input: str, conversation_id: str = None
+    ) -> Generator[str, None, str]:
+        """Generate AI response, yielding it in pieces and returning the full reply"""
+        if self.llm_model and self.tokenizer:
+            return (yield from self._stream_llm_response(user_input, conversation_id))
+        
+        response = self.mock_processor.generate_response(user_input)
+        yield response
+        return response
     
     def text_to_speech(self, text: str) -> bytes:
         """Convert text to speech"""
         if self.demo_mode and not os.getenv('DEMO_ENABLE_TTS', 'true').lower() == 'true':
             return self.mock_processor.text_to_speech(text)
         
-        if self.tts_engine:
+        if self.tts_enabled:
             try:
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                    temp_path = temp_file.name
-                
-                self.tts_engine.save_to_file(text, temp_path)
-                self.tts_engine.runAndWait()
-                
-                with open(temp_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                os.unlink(temp_path)
-                return audio_data
-                
+                return self._tts_executor.submit(self._synthesize, text).result()
             except Exception as e:
-                logger.error(f"❌ TTS error: {e}")
+                logger.error("❌ TTS error: %s", e)
         
         return b""
     
-    def process_demo_conversation(self, user_input: str, conversation_id: str = None) -> dict:
-        """Process conversation in demo mode"""
+    async def stream_tts(self, text: str) -> AsyncIterator[bytes]:
+        """Convert text to speech a sentence at a time, yielding a WAV stream"""
+        async def sentences():
+            for sentence in SENTENCE_END.split(text.strip()):
+                if sentence:
+                    yield sentence
+        
+        async for chunk in self._stream_wav(sentences()):
+            yield chunk
+    
+    async def stream_demo_reply_audio(
+        self, user_input: str, conversation_id: str
+    ) -> AsyncIterator[bytes]:
+        """Process a demo turn, speaking each sentence of the reply as it comes"""
+        sentences = self._stream_reply_sentences(user_input, conversation_id)
+        async for chunk in self._stream_wav(sentences):
+            yield chunk
+    
+    async def _stream_reply_sentences(
+        self, user_input: str, conversation_id: str
+    ) -> AsyncIterator[str]:
+        """Yield the AI reply in sentence-sized chunks as the LLM produces it"""
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+        
+        def produce():
+            try:
+                for piece in self.stream_demo_conversation(user_input, conversation_id):
+                    loop.call_soon_threadsafe(pieces.put_nowait, piece)
+            finally:
+                loop.call_soon_threadsafe(pieces.put_nowait, None)
+        
+        producer = loop.run_in_executor(None, produce)
+        buffer = ""
+        while True:
+            piece = await pieces.get()
+            if piece is None:
+                break
+            
+            buffer += piece
+            *sentences, buffer = SENTENCE_END.split(buffer)
+            # Don't hold back speech for a long run-on sentence
+            if len(buffer.split()) >= MAX_TTS_CHUNK_WORDS:
+                sentences.append(buffer)
+                buffer = ""
+            for sentence in sentences:
+                if sentence.strip():
+                    yield sentence
+        
+        await producer
+        if buffer.strip():
+            yield buffer
+    
+    async def _stream_wav(self, sentences: AsyncIterator[str]) -> AsyncIterator[bytes]:
+        """Synthesize each sentence as it arrives, yielding one continuous WAV stream"""
+        tts_enabled = os.getenv('DEMO_ENABLE_TTS', 'true').lower() == 'true'
+        if self.demo_mode and not tts_enabled:
+            async for sentence in sentences:
+                yield self.mock_processor.text_to_speech(sentence)
+            return
+        
+        header_sent = False
+        async for sentence in sentences:
+            if not self.tts_enabled:
+                continue  # Still let the text be produced
+            
+            try:
+                audio_data = await asyncio.wrap_future(
+                    self._tts_executor.submit(self._synthesize, sentence)
+                )
+                with wave.open(io.BytesIO(audio_data)) as wav:
+                    params = wav.getparams()
+                    frames = wav.readframes(params.nframes)
+            except Exception as e:
+                logger.error("❌ TTS error: %s", e)
+                return
+            
+            if not header_sent:
+                yield wav_stream_header(
+                    params.nchannels, params.sampwidth, params.framerate
+                )
+                header_sent = True
+            yield frames
+    
+    def _synthesize(self, text: str) -> bytes:
+        """Render text to WAV bytes with this thread's TTS engine"""
+        # pyttsx3 can only render to a file
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+            temp_path = temp_file.name
+        
+        try:
+            engine = self._engine()
+            engine.save_to_file(text, temp_path)
+            engine.runAndWait()
+            
+            with open(temp_path, 'rb') as f:
+                return f.read()
+        finally:
+            os.unlink(temp_path)
+    
+    def new_conversation_id(self) -> str:
+        """Create an ID for a new demo conversation"""
+        return f"demo_{uuid.uuid4().hex}"
+    
+    def _lru_entry(self, table: OrderedDict, key: str, factory):
+        """Get or create table[key] as its most recent entry, evicting the oldest"""
+        with self._conversations_lock:
+            if key in table:
+                table.move_to_end(key)
+            else:
+                table[key] = factory()
+                while len(table) > self._max_conversations:
+                    table.popitem(last=False)
+            return table[key]
+    
+    def _demo_turn(self, user_input: str, conversation_id: str = None) -> tuple:
+        """Record a user message and the AI's reply.
+        
+        Returns (conversation_id, history, user_message, ai_message).
+        """
         if not conversation_id:
-            conversation_id = f"demo_{int(time.time())}"
+            conversation_id = self.new_conversation_id()
         
-        if conversation_id not in self.demo_conversations:
-            self.demo_conversations[conversation_id] = []
+        history = self._lru_entry(self.demo_conversations, conversation_id, list)
         
         # Add user input
-        user_message = {
-            "timestamp": datetime.now().isoformat(),
-            "speaker": "user",
-            "message": user_input,
-            "type": "text"
-        }
-        self.demo_conversations[conversation_id].append(user_message)
+        user_message = Message(time.time_ns(), "user", user_input)
+        history.append(user_message)
         
         # Generate AI response
         ai_response = self.generate_response(user_input, conversation_id)
         
         # Add AI response
-        ai_message = {
-            "timestamp": datetime.now().isoformat(),
-            "speaker": "ai",
-            "message": ai_response,
-            "type": "text"
+        ai_message = Message(time.time_ns(), "ai", ai_response)
+        history.append(ai_message)
+        
+        logger.info("👤 User: %s", user_input)
+        logger.info("🤖 AI: %s", ai_response)
+        
+        return conversation_id, history, user_message, ai_message
+    
+    def process_demo_conversation(
+        self, user_input: str, conversation_id: str = None
+    ) -> dict:
+        """Process conversation in demo mode"""
+        conversation_id, history, user_message, ai_message = self._demo_turn(
+            user_input, conversation_id
+        )
+        return {
+            "conversation_id": conversation_id,
+            "user_message": user_message.to_dict(),
+            "ai_response": ai_message.to_dict(),
+            "conversation_history": [message.to_dict() for message in history]
         }
-        self.demo_conversations[conversation_id].append(ai_message)
+    
+    def stream_demo_conversation(
+        self, user_input: str, conversation_id: str
+    ) -> Iterator[str]:
+        """Process conversation in demo mode, yielding the AI response as generated"""
+        history = self._lru_entry(self.demo_conversations, conversation_id, list)
         
-        logger.info(f"👤 User: {user_input}")
-        logger.info(f"🤖 AI: {ai_response}")
+        # Add user input
+        history.append(Message(time.time_ns(), "user", user_input))
+        
+        # Record the reply as cleaned up for the history, which can differ from
+        # the raw pieces streamed to the client
+        ai_response = yield from self.stream_response(user_input, conversation_id)
+        
+        # Add AI response
+        history.append(Message(time.time_ns(), "ai", ai_response))
+        
+        logger.info("👤 User: %s", user_input)
+        logger.info("🤖 AI: %s", ai_response)
+    
+    def process_demo_batch(
+        self, user_inputs: List[str], conversation_id: str = None
+    ) -> dict:
+        """Process several demo turns in one call, in order, on one conversation"""
+        responses = []
+        history = []
+        for user_input in user_inputs:
+            turn_start = time.perf_counter()
+            conversation_id, history, user_message, ai_message = self._demo_turn(
+                user_input, conversation_id
+            )
+            responses.append({
+                "user_message": user_message.to_dict(),
+                "ai_response": ai_message.to_dict(),
+                "latency": time.perf_counter() - turn_start
+            })
         
         return {
             "conversation_id": conversation_id,
-            "user_message": user_message,
-            "ai_response": ai_message,
-            "conversation_history": self.demo_conversations[conversation_id]
+            "responses": responses,
+            "conversation_history": [message.to_dict() for message in history]
         }
     
+    # Async wrappers: run blocking model and Plivo calls on the worker thread
+    # pool so the event loop keeps serving other clients meanwhile
+    async def a_transcribe_audio(self, audio_data: bytes) -> str:
+        return await asyncio.to_thread(self.transcribe_audio, audio_data)
+    
+    async def a_generate_response(
+        self, user_input: str, conversation_id: str = None
+    ) -> str:
+        return await asyncio.to_thread(
+            self.generate_response, user_input, conversation_id
+        )
+    
+    async def a_text_to_speech(self, text: str) -> bytes:
+        return await asyncio.to_thread(self.text_to_speech, text)
+    
+    async def a_process_demo_conversation(
+        self, user_input: str, conversation_id: str = None
+    ) -> dict:
+        return await asyncio.to_thread(
+            self.process_demo_conversation, user_input, conversation_id
+        )
+    
+    async def a_process_demo_batch(
+        self, user_inputs: List[str], conversation_id: str = None
+    ) -> dict:
+        return await asyncio.to_thread(
+            self.process_demo_batch, user_inputs, conversation_id
+        )
+    
+    async def a_prefetch_conversation(self, conversation_id: str) -> bool:
+        return await asyncio.to_thread(self.prefetch_conversation, conversation_id)
+    
+    async def a_make_outbound_call(self, phone_number: str) -> str:
+        return await asyncio.to_thread(self.make_outbound_call, phone_number)
+    
     def make_outbound_call(self, phone_number: str) -> str:
         """Make outbound call (production mode only)"""
         if self.demo_mode:
             call_id = f"demo_call_{int(time.time())}"
-            logger.info(f"📞 Demo call initiated to {phone_number} (Call ID: {call_id})")
+            logger.info(
+                "📞 Demo call initiated to %s (Call ID: %s)", phone_number, call_id
+            )
             return call_id
         
         if not self.plivo_client:
             raise ValueError("Plivo not configured for production calls")
         
         try:
-            public_url = os.getenv('PUBLIC_URL', 'http://localhost:8000')
-            ws_url = f"{public_url.replace('http', 'ws')}/ws/call"
-            
-            answer_xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Stream bidirectional="true" keepCallAlive="true" 
-            streamTimeout="86400" contentType="audio/x-l16" 
-            sampleRate="8000">{ws_url}</Stream>
-</Response>"""
-            
             call = self.plivo_client.calls.create(
                 from_=os.getenv('PLIVO_PHONE_NUMBER'),
                 to_=phone_number,
-                answer_url='data:application/xml;charset=utf-8,' + answer_xml,
+                answer_url=self._answer_url,
                 answer_method='GET'
             )
             
-            logger.info(f"📞 Call initiated to {phone_number}")
+            logger.info("📞 Call initiated to %s", phone_number)
             return call.call_uuid
             
         except Exception as e:
-            logger.error(f"❌ Call failed: {e}")
+            logger.error("❌ Call failed: %s", e)
             raise
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Size the thread pool that model inference is offloaded to"""
+    executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+    asyncio.get_running_loop().set_default_executor(executor)
+    yield
+    executor.shutdown(wait=False)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Voice AI System",
     description="Local testing & production ready voice AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 # Initialize Voice AI
 try:
     voice_ai = VoiceAI()
 except Exception as e:
-    logger.error(f"❌ Failed to initialize Voice AI: {e}")
+    logger.error("❌ Failed to initialize Voice AI: %s", e)
     voice_ai = None
 
-# Routes
-@app.get("/")
-async def root():
-    """Main page with demo interface"""
-    demo_mode = os.getenv('DEMO_MODE', 'true').lower() == 'true'
+def _build_root_html(demo_mode: bool) -> str:
+    """Render the main page with demo interface"""
+    demo_chat_example = (
+        '<p>Demo chat:</p><code>curl -X POST http://localhost:8000/demo/chat '
+        '-H "Content-Type: application/json" '
+        '-d \'{"user_input": "Hello, I need help"}\'</code>'
+        if demo_mode else ''
+    )
+    demo_routes = [
+        ('/demo/chat', 'Demo conversation'),
+        ('/demo/chat/stream', 'Demo conversation streamed as server-sent events'),
+        ('/demo/chat/audio', 'Demo conversation with the reply spoken as WAV audio'),
+        ('/demo/chat/batch', 'Several demo messages in one request'),
+        ('/demo/prefetch', 'Warm up a conversation before its next message'),
+        ('/demo/tts', 'Text to speech, streamed as WAV audio'),
+    ]
+    demo_endpoints = ''.join(
+        f'<li><strong>POST {route}</strong> - {description}</li>'
+        for route, description in demo_routes
+    ) if demo_mode else ''
     
-    html_content = f"""
+    return f"""
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -519,7 +1266,7 @@ async def root():
             <h2>📋 API Endpoints</h2>
             <ul>
                 <li><strong>GET /health</strong> - System health check</li>
-                {'<li><strong>POST /demo/chat</strong> - Demo conversation</li>' if demo_mode else ''}
+                {demo_endpoints}
                 <li><strong>POST /call</strong> - {'Demo call simulation' if demo_mode else 'Make outbound call'}</li>
                 <li><strong>WS /ws/call</strong> - WebSocket for audio streaming</li>
             </ul>
@@ -528,7 +1275,7 @@ async def root():
             <p>Health check:</p>
             <code>curl http://localhost:8000/health</code>
             
-            {'<p>Demo chat:</p><code>curl -X POST http://localhost:8000/demo/chat -H "Content-Type: application/json" -d \'{"user_input": "Hello, I need help"}\'</code>' if demo_mode else ''}
+            {demo_chat_example}
             
             <p>{'Demo call:' if demo_mode else 'Make call:'}</p>
             <code>curl -X POST http://localhost:8000/call -H "Content-Type: application/json" -d '{{"phone_number": "+91XXXXXXXXXX"}}'</code>
@@ -538,26 +1285,35 @@ async def root():
     </body>
     </html>
     """
-    
-    return HTMLResponse(content=html_content)
+
+# Mode and page content are fixed for the life of the process
+DEMO_MODE = os.getenv('DEMO_MODE', 'true').lower() == 'true'
+ROOT_HTML = _build_root_html(DEMO_MODE)
+HEALTH_COMPONENTS = {
+    "whisper": WHISPER_AVAILABLE,
+    "transformers": TRANSFORMERS_AVAILABLE,
+    "tts": TTS_AVAILABLE,
+    "plivo": PLIVO_AVAILABLE and not DEMO_MODE
+}
+
+# Routes
+@app.get("/")
+async def root():
+    """Main page with demo interface"""
+    return HTMLResponse(content=ROOT_HTML)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy" if voice_ai else "unhealthy",
-        "demo_mode": os.getenv('DEMO_MODE', 'true').lower() == 'true',
+        "demo_mode": DEMO_MODE,
         "timestamp": datetime.now().isoformat(),
-        "components": {
-            "whisper": WHISPER_AVAILABLE,
-            "transformers": TRANSFORMERS_AVAILABLE,
-            "tts": TTS_AVAILABLE,
-            "plivo": PLIVO_AVAILABLE and not os.getenv('DEMO_MODE', 'true').lower() == 'true'
-        }
+        "components": HEALTH_COMPONENTS
     }
 
 @app.post("/demo/chat")
-async def demo_chat(request: DemoRequest):
+async def demo_chat(request: DemoRequest, http_request: Request, response: Response):
     """Demo chat endpoint for local testing"""
     if not voice_ai:
         raise HTTPException(status_code=500, detail="Voice AI not initialized")
@@ -566,14 +1322,114 @@ async def demo_chat(request: DemoRequest):
         raise HTTPException(status_code=400, detail="Demo mode not enabled")
     
     try:
-        result = voice_ai.process_demo_conversation(
+        result = await voice_ai.a_process_demo_conversation(
             request.user_input, 
-            request.conversation_id
+            request.conversation_id or http_request.cookies.get(CONVERSATION_COOKIE)
+        )
+        response.set_cookie(
+            CONVERSATION_COOKIE, result["conversation_id"], httponly=True
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
+@app.post("/demo/chat/stream")
+async def demo_chat_stream(request: DemoRequest, http_request: Request):
+    """Demo chat endpoint that streams the AI response as server-sent events"""
+    if not voice_ai:
+        raise HTTPException(status_code=500, detail="Voice AI not initialized")
+    
+    if not voice_ai.demo_mode:
+        raise HTTPException(status_code=400, detail="Demo mode not enabled")
+    
+    conversation_id = (
+        request.conversation_id
+        or http_request.cookies.get(CONVERSATION_COOKIE)
+        or voice_ai.new_conversation_id()
+    )
+    
+    def events():
+        pieces = voice_ai.stream_demo_conversation(request.user_input, conversation_id)
+        for piece in pieces:
+            yield f"data: {json.dumps(piece)}\n\n"
+    
+    response = StreamingResponse(events(), media_type="text/event-stream")
+    response.set_cookie(CONVERSATION_COOKIE, conversation_id, httponly=True)
+    return response
+
+@app.post("/demo/chat/audio")
+async def demo_chat_audio(request: DemoRequest, http_request: Request):
+    """Demo chat endpoint streaming the AI reply as WAV audio, sentence by sentence"""
+    if not voice_ai:
+        raise HTTPException(status_code=500, detail="Voice AI not initialized")
+    
+    if not voice_ai.demo_mode:
+        raise HTTPException(status_code=400, detail="Demo mode not enabled")
+    
+    conversation_id = (
+        request.conversation_id
+        or http_request.cookies.get(CONVERSATION_COOKIE)
+        or voice_ai.new_conversation_id()
+    )
+    
+    response = StreamingResponse(
+        voice_ai.stream_demo_reply_audio(request.user_input, conversation_id),
+        media_type="audio/wav"
+    )
+    response.set_cookie(CONVERSATION_COOKIE, conversation_id, httponly=True)
+    return response
+
+@app.post("/demo/chat/batch")
+async def demo_chat_batch(
+    request: DemoBatchRequest, http_request: Request, response: Response
+):
+    """Demo chat endpoint that handles several messages in one request"""
+    if not voice_ai:
+        raise HTTPException(status_code=500, detail="Voice AI not initialized")
+    
+    if not voice_ai.demo_mode:
+        raise HTTPException(status_code=400, detail="Demo mode not enabled")
+    
+    try:
+        result = await voice_ai.a_process_demo_batch(
+            request.user_inputs,
+            request.conversation_id or http_request.cookies.get(CONVERSATION_COOKIE)
+        )
+        response.set_cookie(
+            CONVERSATION_COOKIE, result["conversation_id"], httponly=True
+        )
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+@app.post("/demo/prefetch")
+async def demo_prefetch(request: DemoPrefetchRequest, http_request: Request):
+    """Warm up a demo conversation before its next message arrives"""
+    if not voice_ai:
+        raise HTTPException(status_code=500, detail="Voice AI not initialized")
+    
+    if not voice_ai.demo_mode:
+        raise HTTPException(status_code=400, detail="Demo mode not enabled")
+    
+    conversation_id = (
+        request.conversation_id or http_request.cookies.get(CONVERSATION_COOKIE)
+    )
+    prefetched = bool(conversation_id) and await voice_ai.a_prefetch_conversation(
+        conversation_id
+    )
+    return {"conversation_id": conversation_id, "prefetched": prefetched}
+
+@app.post("/demo/tts")
+async def demo_tts(request: TTSRequest):
+    """Demo text-to-speech endpoint streaming WAV audio sentence by sentence"""
+    if not voice_ai:
+        raise HTTPException(status_code=500, detail="Voice AI not initialized")
+    
+    if not voice_ai.demo_mode:
+        raise HTTPException(status_code=400, detail="Demo mode not enabled")
+    
+    return StreamingResponse(voice_ai.stream_tts(request.text), media_type="audio/wav")
+
 @app.post("/call")
 async def make_call(request: CallRequest):
     """Make a call (demo or production)"""
@@ -581,7 +1437,7 @@ async def make_call(request: CallRequest):
         raise HTTPException(status_code=500, detail="Voice AI not initialized")
     
     try:
-        call_id = voice_ai.make_outbound_call(request.phone_number)
+        call_id = await voice_ai.a_make_outbound_call(request.phone_number)
         return {
             "success": True,
             "call_id": call_id,
@@ -604,18 +1460,35 @@ async def websocket_endpoint(websocket: WebSocket):
     # Handle WebSocket communication here
     # (Implementation would be similar to previous examples)
     
-    logger.info(f"📞 WebSocket call {call_id} connected")
+    logger.info("📞 WebSocket call %s connected", call_id)
 
-if __name__ == "__main__":
+def main():
+    """Start the server with uvicorn"""
     print("🚀 Starting Voice AI System...")
     print(f"🎭 Demo Mode: {os.getenv('DEMO_MODE', 'true')}")
     print("🌐 Open: http://localhost:8000")
     print("📖 Check README.md for setup instructions")
     
+    # uvicorn[standard] brings uvloop and httptools, which uvicorn's default
+    # "auto" loop/http settings already pick up where they are supported.
+    # Each worker is a separate process with its own models and its own
+    # active_calls/demo_conversations, so with WEB_WORKERS > 1 a conversation
+    # must stick to one worker (sticky sessions) or that state has to move to
+    # a shared store such as Redis. The supervising process that imports this
+    # module also keeps a full, idle copy of the models.
+    dev = os.getenv('DEV', '0') == '1'
+    workers = 1 if dev else int(os.getenv('WEB_WORKERS', 1))
+    
+    # Reload and multiple workers need an import string; a single worker serves
+    # the app built here rather than importing the module (and models) again
     uvicorn.run(
-        "voice_ai:app",
+        app if workers == 1 and not dev else "voice_ai:app",
         host="0.0.0.0",
         port=int(os.getenv('SERVER_PORT', 8000)),
-        reload=True,
+        reload=dev,
+        workers=workers,
         log_level="info"
-    )
\ No newline at end of file
+    )
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,14 @@ import os
 import sys
 import pytest
 import asyncio
+import logging
+import re
+import threading
+import wave
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import torch
 from fastapi.testclient import TestClient
 
 # Add src to path
@@ -16,10 +24,46 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 os.environ['DEMO_MODE'] = 'true'
 os.environ['LOG_LEVEL'] = 'ERROR'  # Reduce test noise
 
-from voice_ai import app, voice_ai
+from voice_ai import app, voice_ai, log_listener
 
 client = TestClient(app)
 
+class FakeEngine:
+    """Stands in for pyttsx3, writing one 16-bit frame per character"""
+    def save_to_file(self, text, path):
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\x01\x00" * len(text))
+    
+    def runAndWait(self):
+        pass
+
+class CharTokenizer:
+    """Stands in for the LLM tokenizer, one token id per character"""
+    pad_token_id = 0
+    
+    def encode(self, text):
+        return [ord(c) for c in text]
+    
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(map(chr, ids))
+
+def use_char_tokenizer(monkeypatch):
+    """Swap in CharTokenizer along with the prompt ids cached from the real tokenizer"""
+    monkeypatch.setattr(voice_ai, "tokenizer", CharTokenizer())
+    monkeypatch.setattr(voice_ai, "_sys_ids", None, raising=False)
+    monkeypatch.setattr(voice_ai, "_asst_marker_ids", None, raising=False)
+    monkeypatch.setattr(voice_ai, "active_calls", OrderedDict())
+    voice_ai._cache_prompt_ids()
+
+def use_fake_tts(monkeypatch):
+    """Give every TTS worker a FakeEngine"""
+    monkeypatch.setattr(voice_ai, "tts_enabled", True)
+    monkeypatch.setattr(voice_ai, "_new_tts_engine", FakeEngine)
+    monkeypatch.setattr(voice_ai, "_tts_local", threading.local())
+
 class TestDemoMode:
     """Test demo mode functionality"""
     
@@ -49,6 +93,109 @@ class TestDemoMode:
         assert "ai_response" in data
         assert "message" in data["ai_response"]
     
+    def test_demo_chat_stream(self):
+        """Test streamed demo chat"""
+        response = client.post("/demo/chat/stream", json={
+            "user_input": "Hello, I need help",
+            "conversation_id": "test_stream_conv"
+        })
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text.startswith("data: ")
+        
+        history = voice_ai.demo_conversations["test_stream_conv"]
+        assert [m.speaker for m in history] == ["user", "ai"]
+        assert len(history[1].message) > 0
+    
+    def test_demo_chat_batch(self):
+        """Test several demo messages in one request"""
+        response = client.post("/demo/chat/batch", json={
+            "user_inputs": ["Hello", "Can you help me?", "Thank you"]
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert "conversation_id" in data
+        assert len(data["responses"]) == 3
+        assert all("message" in item["ai_response"] for item in data["responses"])
+        assert len(data["conversation_history"]) >= 6  # 3 user + 3 AI messages
+    
+    def test_demo_prefetch(self):
+        """Test warming up a conversation before its next message"""
+        response = client.post("/demo/prefetch", json={
+            "conversation_id": "test_prefetch_conv"
+        })
+        assert response.status_code == 200
+        data = response.json()
+        assert data["conversation_id"] == "test_prefetch_conv"
+        assert data["prefetched"] is False  # Nothing to warm up yet
+    
+    def test_concurrent_demo_chats(self):
+        """Test concurrent chats are served by the worker thread pool"""
+        async def chat_concurrently():
+            return await asyncio.gather(*[
+                voice_ai.a_process_demo_conversation(
+                    f"Message {i}", f"test_async_conv_{i}"
+                )
+                for i in range(4)
+            ])
+        
+        results = asyncio.run(chat_concurrently())
+        conversation_ids = [r["conversation_id"] for r in results]
+        assert conversation_ids == [f"test_async_conv_{i}" for i in range(4)]
+        assert all(len(r["conversation_history"]) == 2 for r in results)
+    
+    def test_demo_tts_stream(self, monkeypatch):
+        """Test TTS is streamed as one WAV, synthesized sentence by sentence"""
+        use_fake_tts(monkeypatch)
+        response = client.post("/demo/tts", json={"text": "Hello there. How are you?"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/wav"
+        assert response.content[:4] == b"RIFF"
+        frames = 2 * len("Hello there.") + 2 * len("How are you?")
+        assert len(response.content) == 44 + frames
+    
+    def test_tts_engine_per_thread(self, monkeypatch):
+        """Test each thread synthesizes with an engine of its own"""
+        use_fake_tts(monkeypatch)
+        engines = []
+        threads = [
+            threading.Thread(target=lambda: engines.append(voice_ai._engine()))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len({id(engine) for engine in engines}) == 2
+        assert voice_ai.text_to_speech("Hi")[:4] == b"RIFF"
+    
+    def test_conversations_are_bounded(self, monkeypatch):
+        """Test the least recently used conversation is dropped past the cap"""
+        monkeypatch.setattr(voice_ai, "_max_conversations", 2)
+        monkeypatch.setattr(voice_ai, "demo_conversations", OrderedDict())
+        
+        for conversation_id in ["first", "second", "first", "third"]:
+            voice_ai.process_demo_conversation("Hello", conversation_id)
+        
+        assert list(voice_ai.demo_conversations) == ["first", "third"]
+        assert len(voice_ai.demo_conversations["first"]) == 4
+    
+    def test_demo_chat_audio(self, monkeypatch):
+        """Test the AI reply is streamed back as speech and recorded"""
+        use_fake_tts(monkeypatch)
+        response = client.post("/demo/chat/audio", json={
+            "user_input": "Hello, I need help",
+            "conversation_id": "test_audio_conv"
+        })
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/wav"
+        assert response.content[:4] == b"RIFF"
+        
+        history = voice_ai.demo_conversations["test_audio_conv"]
+        assert [m.speaker for m in history] == ["user", "ai"]
+        assert len(response.content) > 44  # Header plus synthesized frames
+    
     def test_demo_call(self):
         """Test demo call simulation"""
         response = client.post("/call", json={
@@ -80,6 +227,29 @@ class TestDemoMode:
         assert data2["conversation_id"] == conversation_id
         assert len(data2["conversation_history"]) >= 4  # 2 user + 2 AI messages
     
+    def test_conversation_cookie(self):
+        """Test the conversation cookie continues a chat without an explicit ID"""
+        cookie_client = TestClient(app)
+        response1 = cookie_client.post("/demo/chat", json={
+            "user_input": "Hello"
+        })
+        conversation_id = response1.json()["conversation_id"]
+        assert response1.cookies.get("conv") == conversation_id
+        
+        response2 = cookie_client.post("/demo/chat", json={
+            "user_input": "Can you help me?"
+        })
+        assert response2.json()["conversation_id"] == conversation_id
+    
+    def test_new_conversations_get_distinct_ids(self):
+        """Test conversations started at the same moment do not share an ID"""
+        responses = [
+            TestClient(app).post("/demo/chat", json={"user_input": "Hello"})
+            for _ in range(3)
+        ]
+        ids = {response.json()["conversation_id"] for response in responses}
+        assert len(ids) == 3
+    
     def test_invalid_demo_chat(self):
         """Test invalid demo chat request"""
         response = client.post("/demo/chat", json={
@@ -110,6 +280,19 @@ class TestVoiceAIDemo:
         assert isinstance(result, str)
         assert len(result) > 0
     
+    def test_pcm_to_float(self):
+        """Test PCM conversion with and without the shared buffer"""
+        pcm = np.array([0, 16384, -32768, 32767], dtype=np.int16).tobytes()
+        expected = np.array([0.0, 0.5, -1.0, 32767 / 32768], dtype=np.float32)
+        
+        buffered = voice_ai._pcm_to_float(pcm, use_buffer=True)
+        assert np.shares_memory(buffered, voice_ai._audio_buf)
+        assert np.allclose(buffered, expected)
+        
+        standalone = voice_ai._pcm_to_float(pcm, use_buffer=False)
+        assert not np.shares_memory(standalone, voice_ai._audio_buf)
+        assert np.allclose(standalone, expected)
+    
     def test_generate_response_demo(self):
         """Test response generation in demo mode"""
         user_input = "Hello, I need help"
@@ -117,6 +300,76 @@ class TestVoiceAIDemo:
         assert isinstance(response, str)
         assert len(response) > 0
     
+    def test_prompt_stays_within_limit(self, monkeypatch):
+        """Test long conversations are trimmed to the prompt limit, oldest first"""
+        use_char_tokenizer(monkeypatch)
+        for turn in range(10):
+            call_data, inputs = voice_ai._prepare_llm_inputs(
+                f"{turn}" * 150, "test_prompt_conv"
+            )
+            voice_ai._record_llm_response(call_data, "Sure, I can help with that.")
+            
+            prompt = "".join(map(chr, inputs[0].tolist()))
+            assert len(prompt) <= 400
+            assert prompt.startswith("You are a helpful customer service")
+            assert prompt.endswith(f"{turn}\nAssistant:")
+    
+    def test_stream_survives_generation_error(self, monkeypatch):
+        """Test a failed generation ends the stream with the fallback reply"""
+        class FailingModel:
+            def generate(self, *args, **kwargs):
+                raise RuntimeError("out of memory")
+        
+        use_char_tokenizer(monkeypatch)
+        monkeypatch.setattr(voice_ai, "llm_model", FailingModel())
+        pieces = list(voice_ai.stream_response("Hello", "test_failing_conv"))
+        assert len(pieces) == 1
+        assert pieces[0].startswith("I apologize for the technical difficulty.")
+    
+    def test_streamed_reply_is_recorded_cleaned(self, monkeypatch):
+        """Test a streamed turn stores the same cleaned reply as /demo/chat"""
+        use_char_tokenizer(monkeypatch)
+        monkeypatch.setattr(voice_ai, "llm_model", object())
+        monkeypatch.setattr(voice_ai, "_kv_caches", OrderedDict())
+        monkeypatch.setattr(voice_ai, "demo_conversations", OrderedDict())
+        
+        def stream_short_reply(inputs, past, streamer, outcome):
+            streamer.on_finalized_text("ok", stream_end=True)
+            outcome["kv_cache"] = (None, [])
+        monkeypatch.setattr(voice_ai, "_generate_with_streamer", stream_short_reply)
+        
+        streamed = "".join(voice_ai.stream_demo_conversation("Hi", "test_cleaned_conv"))
+        fallback = "I understand. How else can I help you?"
+        assert streamed == "ok"
+        assert voice_ai.demo_conversations["test_cleaned_conv"][1].message == fallback
+        history = voice_ai.active_calls["test_cleaned_conv"]["history"]
+        assert history[-1] == f"Assistant: {fallback}"
+    
+    def test_stream_uses_prefetched_kv_cache(self, monkeypatch, make_batched_llm):
+        """Test a streamed turn continues from the cache filled by prefetch"""
+        use_char_tokenizer(monkeypatch)
+        model = tiny_gpt2(n_layer=1, n_embd=32)
+        monkeypatch.setattr(voice_ai, "llm_model", model)
+        monkeypatch.setattr(
+            voice_ai, "batched_llm", make_batched_llm(model, 0, greedy), raising=False
+        )
+        monkeypatch.setattr(voice_ai, "_kv_caches", OrderedDict())
+        
+        pasts = []
+        generate = voice_ai._generate_with_streamer
+        def record_past(inputs, past, streamer, outcome):
+            pasts.append(past)
+            generate(inputs, past, streamer, outcome)
+        monkeypatch.setattr(voice_ai, "_generate_with_streamer", record_past)
+        
+        list(voice_ai.stream_response("Hello", "test_stream_cache_conv"))
+        assert voice_ai.prefetch_conversation("test_stream_cache_conv")
+        reply = "".join(voice_ai.stream_response("Thanks", "test_stream_cache_conv"))
+        
+        assert pasts[0] is None and pasts[1] is not None
+        assert "test_stream_cache_conv" in voice_ai._kv_caches
+        assert not reply.startswith("I apologize")
+    
     def test_text_to_speech_demo(self):
         """Test TTS in demo mode"""
         text = "Hello, this is a test"
@@ -141,12 +394,122 @@ class TestVoiceAIDemo:
         assert user_msg["speaker"] == "user"
         assert user_msg["type"] == "text"
         assert "timestamp" in user_msg
+        datetime.fromisoformat(user_msg["timestamp"])  # Serialized as ISO 8601
         
         ai_msg = result["ai_response"]
         assert ai_msg["speaker"] == "ai"
         assert ai_msg["type"] == "text"
         assert "timestamp" in ai_msg
 
+def test_quantize_llm():
+    """Test int8 quantization reaches the GPT-2 projection layers"""
+    transformers = pytest.importorskip("transformers")
+    from voice_ai import quantize_llm
+    
+    config = transformers.GPT2Config(n_layer=1, n_embd=32, n_head=2)
+    model = quantize_llm(transformers.GPT2LMHeadModel(config).eval())
+    
+    attention = model.transformer.h[0].attn.c_attn
+    assert attention.__module__.startswith("torch.ao.nn.quantized")
+    output = model.generate(torch.tensor([[1, 2, 3]]), max_length=6, pad_token_id=0)
+    assert output.shape == (1, 6)
+
+GREEDY_KWARGS = {"max_new_tokens": 5, "do_sample": False, "pad_token_id": 0}
+
+def greedy(inputs):
+    return GREEDY_KWARGS
+
+def tiny_gpt2(n_layer: int, n_embd: int):
+    """A randomly initialized GPT-2 small enough to run in tests"""
+    transformers = pytest.importorskip("transformers")
+    config = transformers.GPT2Config(n_layer=n_layer, n_embd=n_embd, n_head=2)
+    return transformers.GPT2LMHeadModel(config).eval()
+
+@pytest.fixture
+def make_batched_llm():
+    """Build BatchedLLMs whose worker threads are stopped after the test"""
+    from voice_ai import BatchedLLM
+    instances = []
+    
+    def make(*args, **kwargs):
+        instances.append(BatchedLLM(*args, **kwargs))
+        return instances[-1]
+    
+    yield make
+    for batched in instances:
+        batched.close()
+
+def test_batched_llm(make_batched_llm):
+    """Test concurrent prompts are generated together and answered separately"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    model = tiny_gpt2(n_layer=1, n_embd=32)
+    batch_sizes = []
+    
+    def generation_kwargs(inputs):
+        batch_sizes.append(inputs.shape[0])
+        return {**GREEDY_KWARGS, "min_new_tokens": 5}
+    
+    batched = make_batched_llm(
+        model, 0, generation_kwargs, window_ms=200, max_batch_size=4
+    )
+    prompts = [[1, 2, 3], [4, 5], [6], [7, 8, 9, 10]]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        outputs = list(pool.map(batched.submit, prompts))
+    
+    assert [len(output_ids) for output_ids, _ in outputs] == [5] * 4
+    assert max(batch_sizes) > 1
+
+def test_batched_llm_close(make_batched_llm):
+    """Test closing stops the worker thread"""
+    batched = make_batched_llm(tiny_gpt2(n_layer=1, n_embd=32), 0, greedy)
+    batched.close()
+    batched._thread.join(timeout=5)
+    assert not batched._thread.is_alive()
+
+def test_batched_llm_reuses_kv_cache(make_batched_llm):
+    """Test continuing a conversation from its cache matches generating from scratch"""
+    torch.manual_seed(0)
+    batched = make_batched_llm(tiny_gpt2(n_layer=2, n_embd=64), 0, greedy)
+    
+    first_turn = list(range(1, 40))
+    reply, kv_cache = batched.submit(first_turn)
+    second_turn = first_turn + reply + [7, 8, 9]
+    
+    assert batched.submit(second_turn, kv_cache)[0] == batched.submit(second_turn)[0]
+
+def test_batched_llm_prefill(make_batched_llm):
+    """Test a prefilled cache continues the conversation like generating from scratch"""
+    torch.manual_seed(0)
+    batched = make_batched_llm(tiny_gpt2(n_layer=2, n_embd=64), 0, greedy)
+    
+    prefix = list(range(1, 40))
+    kv_cache = batched.prefill(prefix)
+    assert kv_cache[1] == prefix
+    
+    prompt = prefix + [7, 8, 9]
+    assert batched.submit(prompt, kv_cache)[0] == batched.submit(prompt)[0]
+
+def test_log_format():
+    """Test log lines are formatted once, by the listener's handlers"""
+    logging.getLogger("format_check").error("Format check")
+    log_listener.queue.join()
+    
+    file_handler = log_listener.handlers[0]
+    file_handler.flush()
+    with open(file_handler.baseFilename) as f:
+        last_line = f.read().splitlines()[-1]
+    assert re.fullmatch(
+        r"[\d-]+ [\d:,]+ - format_check - ERROR - Format check", last_line
+    )
+
+def test_setup_logging_is_idempotent():
+    """Test importing the module again reuses its log handler and listener"""
+    from voice_ai import setup_logging
+    assert setup_logging() is log_listener
+    names = [handler.get_name() for handler in logging.getLogger().handlers]
+    assert names.count("voice_ai_queue") == 1
+
 def test_demo_mode_environment():
     """Test demo mode environment variables"""
     assert os.getenv('DEMO_MODE', 'true').lower() == 'true'